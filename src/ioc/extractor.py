@@ -19,14 +19,20 @@ IoC Extractor - Профессиональный инструмент для и
 
 from __future__ import annotations
 
+import os
 import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Iterator, Optional
-from urllib.parse import urlparse
 
 from docx import Document as DocxDocument
 from docx.document import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.document import CT_Body
+from docx.oxml.parser import parse_xml
+from lxml import etree
 
 from rules.list_after_colon import ListAfterColonRule
 from rules.table_after_header import TableAfterHeaderRule
@@ -36,7 +42,38 @@ from rules.rule import IoCExtractionRule
 from ioc.normalizer import IoC, IoCType, IoCNormalizer
 
 
-@dataclass
+# Связи пакета OOXML, указывающие на основной документ
+_PACKAGE_RELS = '_rels/.rels'
+_PACKAGE_RELS_NS = {'r': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+_DEFAULT_DOCUMENT_PART = 'word/document.xml'
+
+
+def _open_document_body(filepath: str) -> CT_Body:
+    """
+    Читает из DOCX-архива только основной документ и возвращает его <w:body>.
+    
+    В отличие от DocxDocument() не загружает остальные части пакета
+    (стили, нумерацию, колонтитулы, медиа). Элементы разбираются парсером
+    python-docx, поэтому доступны те же oxml-классы (CT_P, CT_Tbl и т.д.).
+    """
+    with zipfile.ZipFile(filepath) as zf:
+        part_name = _DEFAULT_DOCUMENT_PART
+        if _PACKAGE_RELS in zf.namelist():
+            rels = etree.fromstring(zf.read(_PACKAGE_RELS))
+            targets = rels.xpath(
+                'r:Relationship[@Type=$rel_type]/@Target',
+                namespaces=_PACKAGE_RELS_NS,
+                rel_type=RT.OFFICE_DOCUMENT,
+            )
+            if targets:
+                part_name = targets[0].lstrip('/')
+        
+        document_xml = zf.read(part_name)
+    
+    return parse_xml(document_xml).body
+
+
+@dataclass(slots=True)
 class ExtractionResult:
     """
     Результат извлечения IoC из одного файла.
@@ -45,17 +82,38 @@ class ExtractionResult:
         filepath: Путь к обработанному файлу
         iocs: Список найденных индикаторов
         errors: Список ошибок, возникших при обработке
+    
+    Индикаторы следует добавлять через add(), чтобы поддерживать индекс по типам.
     """
     filepath: str
     iocs: list[IoC] = field(default_factory=list)
     errors: list[str] = field(default_factory=list)
+    _by_type: dict[IoCType, list[IoC]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._rebuild_index()
+    
+    def _rebuild_index(self) -> None:
+        """Перестраивает индекс по типам после изменения iocs или типов IoC на месте."""
+        self._by_type.clear()
+        for ioc in self.iocs:
+            self._by_type.setdefault(ioc.ioc_type, []).append(ioc)
     
     def __len__(self):
         return len(self.iocs)
     
+    def add(self, ioc: IoC) -> None:
+        """Добавляет IoC в результат и в индекс по типам."""
+        self.iocs.append(ioc)
+        self._by_type.setdefault(ioc.ioc_type, []).append(ioc)
+    
     def by_type(self, ioc_type: IoCType) -> list[IoC]:
         """Возвращает IoC определённого типа."""
-        return [ioc for ioc in self.iocs if ioc.ioc_type == ioc_type]
+        return list(self._by_type.get(ioc_type, ()))
+    
+    def count_by_type(self, ioc_type: IoCType) -> int:
+        """Возвращает количество IoC определённого типа (без копирования списка)."""
+        return len(self._by_type.get(ioc_type, ()))
     
     def unique_values(self) -> set[str]:
         """Возвращает уникальные значения IoC."""
@@ -90,30 +148,40 @@ class IoCExtractor:
         Args:
             use_default_rules: Если True, добавляет стандартные правила извлечения.
         """
+        # Список задаёт порядок применения правил, словарь - поиск по имени за O(1)
         self._rules: list[IoCExtractionRule] = []
+        self._rules_by_name: dict[str, IoCExtractionRule] = {}
 
         normlizer = IoCNormalizer(
             hash_original=hash_original
         )
         
         if use_default_rules:
-            self._rules.extend([
+            for rule in (
                 ListAfterColonRule(normlizer),
                 TableAfterHeaderRule(normlizer),
                 RegexPatternRule(normlizer),
-            ])
+            ):
+                self.add_rule(rule)
     
     def add_rule(self, rule: IoCExtractionRule) -> "IoCExtractor":
         """
         Добавляет правило извлечения.
         
+        Правило с уже зарегистрированным именем заменяет прежнее на его месте.
+        
         Args:
             rule: Экземпляр правила
             
         Returns:
             self для цепочки вызовов
         """
-        self._rules.append(rule)
+        previous = self._rules_by_name.get(rule.name)
+        if previous is not None:
+            self._rules[self._rules.index(previous)] = rule
+        else:
+            self._rules.append(rule)
+        self._rules_by_name[rule.name] = rule
         return self
     
     def remove_rule(self, rule_name: str) -> "IoCExtractor":
@@ -126,12 +194,14 @@ class IoCExtractor:
         Returns:
             self для цепочки вызовов
         """
-        self._rules = [r for r in self._rules if r.name != rule_name]
+        rule = self._rules_by_name.pop(rule_name, None)
+        if rule is not None:
+            self._rules.remove(rule)
         return self
     
     def get_rules(self) -> list[str]:
         """Возвращает список имён активных правил."""
-        return [r.name for r in self._rules]
+        return list(self._rules_by_name)
     
 
     def extract_base_domain_from_url(self, url: str) -> str:
@@ -144,16 +214,7 @@ class IoCExtractor:
         Returns:
             Базовый домен (например, example.com)
         """
-        parsed = urlparse(url)
-        host_with_port = parsed.netloc
-        
-        if ':' in host_with_port:
-            # Проверяем, что после : идут только цифры (это порт)
-            parts = host_with_port.rsplit(':', 1)
-            if parts[1].isdigit():
-                return parts[0]
-        
-        return host_with_port
+        return IoCNormalizer.base_domain_from_url(url)
     
     def extract_base_domain_from_domain(self, domain: str) -> str:
         """
@@ -165,12 +226,7 @@ class IoCExtractor:
         Returns:
             Базовый домен (например, example.com)
         """
-        # Убираем порт, если он присутствует
-        if ':' in domain:
-            # Отделяем порт (всё после последнего двоеточия)
-            return domain.rsplit(':', 1)[0]
-        
-        return domain
+        return IoCNormalizer.base_domain_from_domain(domain)
 
     def extract(self, filepath: str | Path, pass_unknown: bool = False, url_original: bool = False) -> ExtractionResult:
         """
@@ -182,72 +238,163 @@ class IoCExtractor:
         Returns:
             ExtractionResult с найденными IoC и возможными ошибками
         """
-        filepath = Path(filepath)
-        result = ExtractionResult(filepath=str(filepath))
+        if not isinstance(filepath, Path):
+            filepath = Path(filepath)
+        filepath_str = str(filepath)
+        result = ExtractionResult(filepath=filepath_str)
         
         if not filepath.exists():
-            result.errors.append(f"Файл не найден: {filepath}")
+            result.errors.append(f"Файл не найден: {filepath_str}")
             return result
         
-        if not filepath.suffix.lower() == '.docx':
+        if filepath_str[-5:].lower() != '.docx':
             result.errors.append(f"Неподдерживаемый формат файла: {filepath.suffix}")
             return result
         
+        # Если всем правилам достаточно XML основного документа, не загружаем пакет целиком
+        use_tree = all(rule.supports_tree for rule in self._rules)
+        
         try:
-            document = DocxDocument(str(filepath))
+            if use_tree:
+                source = _open_document_body(filepath_str)
+            else:
+                source = DocxDocument(filepath_str)
         except Exception as e:
             result.errors.append(f"Ошибка открытия документа: {e}")
             return result
         
         # Применяем все правила и собираем IoC
-        seen_iocs = set()  # Для дедупликации по (value, type)
+        # Для дедупликации по (value, type): отдельное множество значений на каждый тип,
+        # чтобы не создавать кортеж-ключ на каждый IoC
+        seen_values: dict[IoCType, set[str]] = {ioc_type: set() for ioc_type in IoCType}
+        
+        # Локальные ссылки вместо поиска атрибутов на каждой итерации горячего цикла
+        add_ioc = result.add
+        UNKNOWN = IoCType.UNKNOWN
         
         for rule in self._rules:
+            rule_name = rule.name
+            extract_rule = rule.extract_from_tree if use_tree else rule.extract
             try:
-                for ioc in rule.extract(document):
-                    if not pass_unknown and ioc.ioc_type == IoCType.UNKNOWN:
+                for ioc in extract_rule(source):
+                    ioc_type = ioc.ioc_type
+                    if not pass_unknown and ioc_type == UNKNOWN:
                         continue
 
-                    if not url_original:
-                        if ioc.ioc_type == IoCType.URL:
-                            ioc.value = self.extract_base_domain_from_url(ioc.value)
-                            ioc.ioc_type = IoCType.DOMAIN
-                        elif ioc.ioc_type == IoCType.DOMAIN:
-                            ioc.value = self.extract_base_domain_from_domain(ioc.value)
-
                     # Дедупликация
-                    key = (ioc.value, ioc.ioc_type)
-                    if key not in seen_iocs:
-                        seen_iocs.add(key)
-                        ioc.rule_extracted = rule.name
-                        result.iocs.append(ioc)
+                    values = seen_values[ioc_type]
+                    value = ioc.value
+                    if value not in values:
+                        values.add(value)
+                        ioc.rule_extracted = rule_name
+                        add_ioc(ioc)
             except Exception as e:
-                result.errors.append(f"Ошибка в правиле '{rule.name}': {e}")
+                result.errors.append(f"Ошибка в правиле '{rule_name}': {e}")
+        
+        if not url_original:
+            self._collapse_to_base_domains(result)
         
         return result
     
+    def _collapse_to_base_domains(self, result: ExtractionResult) -> None:
+        """
+        Сводит все URL и домены результата к базовым доменам одним проходом после правил.
+        
+        Разные URL могут дать один и тот же домен, поэтому домены дедуплицируются
+        заново с сохранением первого вхождения (и правила, которое его нашло).
+        """
+        collapse_to_base_domain = IoCNormalizer.collapse_to_base_domain
+        collapsible = [
+            ioc
+            for ioc_type in IoCNormalizer.BASE_DOMAIN_TYPES
+            for ioc in result._by_type.get(ioc_type, ())
+        ]
+        if not collapsible:
+            return
+        
+        for ioc in collapsible:
+            collapse_to_base_domain(ioc)
+        
+        DOMAIN = IoCType.DOMAIN
+        seen_domains: set[str] = set()
+        kept = []
+        for ioc in result.iocs:
+            if ioc.ioc_type == DOMAIN:
+                if ioc.value in seen_domains:
+                    continue
+                seen_domains.add(ioc.value)
+            kept.append(ioc)
+        
+        result.iocs[:] = kept
+        result._rebuild_index()
+    
     def extract_from_files(
         self, 
         filepaths: list[str | Path],
         pass_unknown: bool = False,
         url_original: bool = False,
+        max_workers: Optional[int] = None,
     ) -> dict[str, ExtractionResult]:
         """
         Извлекает IoC из нескольких файлов.
         
+        Файлы независимы друг от друга, поэтому при нескольких файлах они
+        обрабатываются параллельно в пуле процессов (разбор DOCX и применение
+        правил упираются в CPU, и потоки здесь не помогут из-за GIL).
+        
         Args:
             filepaths: Список путей к файлам
+            max_workers: Количество рабочих процессов (по умолчанию: число ядер).
+                         При значении 1 файлы обрабатываются последовательно.
             
         Returns:
-            Словарь {путь_к_файлу: ExtractionResult}
+            Словарь {путь_к_файлу: ExtractionResult} в порядке filepaths
         """
+        if len(filepaths) <= 1 or max_workers == 1:
+            return self._extract_sequential(filepaths, pass_unknown, url_original)
+        
+        if max_workers is None:
+            max_workers = min(len(filepaths), os.cpu_count() or 1)
+        
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        except (NotImplementedError, OSError):
+            # Платформа не поддерживает многопроцессность (например, нет sem_open)
+            return self._extract_sequential(filepaths, pass_unknown, url_original)
+        
+        # Заранее заполняем словарь, чтобы сохранить порядок входных файлов
+        results: dict[str, ExtractionResult] = {str(filepath): None for filepath in filepaths}
+        
+        with executor:
+            futures = {
+                executor.submit(self.extract, Path(filepath), pass_unknown, url_original): str(filepath)
+                for filepath in filepaths
+            }
+            for future in as_completed(futures):
+                filepath_str = futures[future]
+                try:
+                    results[filepath_str] = future.result()
+                except Exception as e:
+                    # Например, пользовательское правило не удалось передать в процесс
+                    result = ExtractionResult(filepath=filepath_str)
+                    result.errors.append(f"Ошибка обработки файла: {e}")
+                    results[filepath_str] = result
+        
+        return results
+    
+    def _extract_sequential(
+        self,
+        filepaths: list[str | Path],
+        pass_unknown: bool,
+        url_original: bool,
+    ) -> dict[str, ExtractionResult]:
+        """Последовательно извлекает IoC из файлов в текущем процессе."""
         results = {}
         
         for filepath in filepaths:
-            filepath_str = str(filepath)
-            results[filepath_str] = self.extract(filepath,
-                                                 pass_unknown=pass_unknown,
-                                                 url_original=url_original)
+            results[str(filepath)] = self.extract(Path(filepath),
+                                                  pass_unknown=pass_unknown,
+                                                  url_original=url_original)
         
         return results
 
@@ -258,6 +405,7 @@ def extract_iocs_from_files(
     pass_unknown: bool = False,
     hash_original: bool = False,
     url_original: bool = False,
+    max_workers: Optional[int] = None,
 ) -> dict[str, ExtractionResult]:
     """
     Удобная функция для извлечения IoC из нескольких файлов.
@@ -265,6 +413,7 @@ def extract_iocs_from_files(
     Args:
         filepaths: Список путей к DOCX-файлам
         custom_rules: Дополнительные правила извлечения (опционально)
+        max_workers: Количество рабочих процессов (см. IoCExtractor.extract_from_files)
         
     Returns:
         Словарь {путь_к_файлу: ExtractionResult}
@@ -288,7 +437,8 @@ def extract_iocs_from_files(
     
     return extractor.extract_from_files(filepaths,
                                         pass_unknown=pass_unknown,
-                                        url_original=url_original)
+                                        url_original=url_original,
+                                        max_workers=max_workers)
 
 
 # ============================================================================
@@ -309,8 +459,12 @@ class CustomMitreATTCKRule(IoCExtractionRule):
         return "mitre_attck"
     
     def extract(self, document: Document) -> Iterator[IoC]:
-        for paragraph in document.paragraphs:
-            text = self._get_paragraph_text(paragraph)
+        return self.extract_from_tree(document.element.body)
+    
+    def extract_from_tree(self, body: CT_Body) -> Iterator[IoC]:
+        # Обходим элементы <w:p> напрямую, без обёрток Paragraph/Run
+        for p in body.p_lst:
+            text = self._get_paragraph_element_text(p)
             
             for match in self.MITRE_PATTERN.finditer(text):
                 yield IoC(
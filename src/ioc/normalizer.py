@@ -1,5 +1,7 @@
 
 import re
+import string
+from functools import lru_cache
 from enum import Enum, auto
 from dataclasses import dataclass
 
@@ -21,7 +23,7 @@ class IoCType(Enum):
     UNKNOWN = auto()
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class IoC:
     """
     Представление одного индикатора компрометации.
@@ -32,6 +34,9 @@ class IoC:
         source_context: Контекст, в котором был найден индикатор
         defanged: Был ли индикатор "обезврежен" (например, hxxps вместо https)
         original_value: Исходное значение до нормализации (если применимо)
+    
+    Экземпляры создаются на каждый найденный индикатор, поэтому класс объявлен
+    со __slots__ (без __dict__). Равенство и хэш определены ниже по (value, ioc_type).
     """
     value: str
     ioc_type: IoCType = IoCType.UNKNOWN
@@ -56,6 +61,50 @@ class IoC:
 
 
 
+# Все дефанг-последовательности одним выражением, чтобы строка просматривалась за один проход:
+#   hxxps -> https, hxxp -> http, [:] -> :, [.] -> ., [dot] -> ., [@] -> @, [at] -> @
+# Без учёта регистра сопоставляются только [dot] и [at].
+_DEFANG_RE = re.compile(r'hxxps|hxxp|\[:\]|\[\.\]|(?i:\[dot\])|\[@\]|(?i:\[at\])')
+_DEFANG_MAP = {
+    'hxxps': 'https',
+    'hxxp': 'http',
+    '[:]': ':',
+    '[.]': '.',
+    '[dot]': '.',
+    '[@]': '@',
+    '[at]': '@',
+}
+
+# Хост (с возможным портом) из URL вида scheme://host[:port][/path][?query][#fragment]
+_URL_HOST_RE = re.compile(r'^[a-zA-Z][\w+.-]*://([^/?#]+)')
+# Числовой порт в конце хоста
+_PORT_RE = re.compile(r':\d+$')
+
+# Тип хэша однозначно определяется длиной hex-строки
+_HASH_TYPE_BY_LENGTH = {
+    32: IoCType.HASH_MD5,
+    40: IoCType.HASH_SHA1,
+    64: IoCType.HASH_SHA256,
+    128: IoCType.HASH_SHA512,
+}
+_HEX_DIGITS = frozenset(string.hexdigits)
+
+
+def _refang_replacement(match: re.Match) -> str:
+    return _DEFANG_MAP[match.group().lower()]
+
+
+# Одни и те же значения встречаются в документе многократно (в том числе находятся
+# разными правилами), поэтому результаты refang/classify кэшируются по значению
+_NORMALIZE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=_NORMALIZE_CACHE_SIZE)
+def _refang_cached(value: str) -> tuple[str, bool]:
+    result, count = _DEFANG_RE.subn(_refang_replacement, value)
+    return result, count > 0
+
+
 class IoCNormalizer:
     """
     Утилитарный класс для нормализации и определения типов IoC.
@@ -66,17 +115,6 @@ class IoCNormalizer:
     - Классификации IoC по паттернам
     """
     
-    # Паттерны для "дефангинга" (обезвреживания) URL
-    DEFANG_PATTERNS = [
-        (r'hxxps', 'https'),              # hxxps -> https
-        (r'hxxp', 'http'),                # hxxp -> http
-        (r'\[:\]', ':'),                   # [:] -> :
-        (r'\[\.\]', '.'),                  # [.] -> .
-        (r'\[dot\]', '.', re.IGNORECASE),  # [dot] -> .
-        (r'\[@\]', '@'),                   # [@] -> @
-        (r'\[at\]', '@', re.IGNORECASE),   # [at] -> @
-    ]
-    
     # Регулярные выражения для определения типов IoC
     PATTERNS = {
         IoCType.HASH_MD5: re.compile(r'^[a-fA-F0-9]{32}$'),
@@ -100,6 +138,9 @@ class IoCNormalizer:
         ),
     }
 
+    # Типы, которые collapse_to_base_domain() сводит к базовому домену
+    BASE_DOMAIN_TYPES = frozenset({IoCType.URL, IoCType.DOMAIN})
+
     _hash_original = False
     
     def __init__(self,
@@ -118,20 +159,64 @@ class IoCNormalizer:
         Returns:
             Кортеж (нормализованное_значение, был_ли_дефангирован)
         """
-        result = value
-        was_defanged = False
+        return _refang_cached(value)
+    
+    @staticmethod
+    def base_domain_from_url(url: str) -> str:
+        """
+        Извлекает базовый домен из URL.
+        
+        Args:
+            url: Полный URL
+            
+        Returns:
+            Базовый домен (например, example.com)
+        """
+        match = _URL_HOST_RE.match(url)
+        host_with_port = match.group(1) if match else url
+        
+        # Убираем порт, если после : идут только цифры
+        return _PORT_RE.sub('', host_with_port)
+    
+    @staticmethod
+    def base_domain_from_domain(domain: str) -> str:
+        """
+        Извлекает базовый домен из доменного имени.
+        
+        Args:
+            domain: Полное доменное имя
+            
+        Returns:
+            Базовый домен (например, example.com)
+        """
+        # Убираем порт, если он присутствует
+        if ':' in domain:
+            # Отделяем порт (всё после последнего двоеточия)
+            return domain.rsplit(':', 1)[0]
+        
+        return domain
+    
+    @classmethod
+    def collapse_to_base_domain(cls, ioc: IoC) -> IoC:
+        """
+        Сводит URL и домен к базовому домену (изменяет ioc на месте).
+        
+        URL превращается в DOMAIN с хостом URL, у домена отбрасывается порт.
+        IoC других типов возвращаются без изменений.
         
-        for pattern_tuple in cls.DEFANG_PATTERNS:
-            pattern = pattern_tuple[0]
-            replacement = pattern_tuple[1]
-            flags = pattern_tuple[2] if len(pattern_tuple) > 2 else 0
+        Args:
+            ioc: Индикатор
             
-            new_result = re.sub(pattern, replacement, result, flags=flags)
-            if new_result != result:
-                was_defanged = True
-                result = new_result
+        Returns:
+            Тот же объект IoC
+        """
+        if ioc.ioc_type == IoCType.URL:
+            ioc.value = cls.base_domain_from_url(ioc.value)
+            ioc.ioc_type = IoCType.DOMAIN
+        elif ioc.ioc_type == IoCType.DOMAIN:
+            ioc.value = cls.base_domain_from_domain(ioc.value)
         
-        return result, was_defanged
+        return ioc
     
     @classmethod
     def classify(cls, value: str) -> IoCType:
@@ -144,19 +229,7 @@ class IoCNormalizer:
         Returns:
             Тип индикатора (IoCType)
         """
-        # Сначала пробуем определить как хэш (наиболее строгие паттерны)
-        for ioc_type in [IoCType.HASH_MD5, IoCType.HASH_SHA1, 
-                         IoCType.HASH_SHA256, IoCType.HASH_SHA512]:
-            if cls.PATTERNS[ioc_type].match(value):
-                return ioc_type
-        
-        # Затем другие типы
-        for ioc_type in [IoCType.CVE, IoCType.IP_ADDRESS, IoCType.EMAIL,
-                         IoCType.URL, IoCType.DOMAIN]:
-            if cls.PATTERNS[ioc_type].match(value):
-                return ioc_type
-        
-        return IoCType.UNKNOWN
+        return _classify_cached(value)
     
     @classmethod
     def normalize_and_classify(cls, value: str, context: str = "") -> IoC:
@@ -191,3 +264,69 @@ class IoCNormalizer:
             original_value=original
         )
 
+
+def _build_classify_re(*ioc_types: IoCType) -> re.Pattern:
+    """
+    Объединяет паттерны IoCNormalizer.PATTERNS в одно выражение с именованными группами.
+    
+    Порядок альтернатив задаёт приоритет типов, как при последовательных проверках.
+    """
+    alternatives = '|'.join(
+        # Якоря ^...$ отдельных паттернов заменяются общими
+        f'(?P<{ioc_type.name}>{IoCNormalizer.PATTERNS[ioc_type].pattern[1:-1]})'
+        for ioc_type in ioc_types
+    )
+    return re.compile(f'^(?:{alternatives})$', re.IGNORECASE)
+
+
+# Хэши проверяются отдельно по длине, остальные типы - в порядке приоритета,
+# причём в выражение попадают только паттерны, которые вообще могут совпасть:
+# CVE начинается с "C", IP - с цифры, email требует "@", а URL и домен
+# начинаются с символа \w и "@" допускает только URL
+_AT_SIGN_CLASSIFY_RE = _build_classify_re(IoCType.EMAIL, IoCType.URL)
+_WORD_CLASSIFY_RE = _build_classify_re(IoCType.URL, IoCType.DOMAIN)
+_FIRST_CHAR_DISPATCH = {
+    **dict.fromkeys(string.ascii_letters + '_', _WORD_CLASSIFY_RE),
+    **dict.fromkeys('cC', _build_classify_re(IoCType.CVE, IoCType.URL, IoCType.DOMAIN)),
+    **dict.fromkeys(string.digits, _build_classify_re(IoCType.IP_ADDRESS, IoCType.URL, IoCType.DOMAIN)),
+}
+_GROUP_TO_TYPE = {ioc_type.name: ioc_type for ioc_type in IoCType}
+_CVE_RE = IoCNormalizer.PATTERNS[IoCType.CVE]
+
+
+@lru_cache(maxsize=_NORMALIZE_CACHE_SIZE)
+def _classify_cached(value: str) -> IoCType:
+    # Сначала пробуем определить как хэш (наиболее строгие паттерны):
+    # длина отсекает большинство значений ещё до проверки символов
+    hash_type = _HASH_TYPE_BY_LENGTH.get(len(value))
+    if hash_type is not None and _HEX_DIGITS.issuperset(value):
+        return hash_type
+    
+    # Затем другие типы - одним проходом объединённого выражения,
+    # в которое входят только паттерны, совместимые с видом значения
+    if '@' in value:
+        # '@' допустим только в email и URL
+        classify_re = _AT_SIGN_CLASSIFY_RE
+    else:
+        first = value[:1]
+        
+        # Без "." и ":" не бывает ни IP, ни домена, ни URL - остаётся только CVE.
+        # Так описания и комментарии из ячеек таблиц отсекаются без regex
+        if '.' not in value and ':' not in value:
+            if first in ('c', 'C') and _CVE_RE.match(value):
+                return IoCType.CVE
+            return IoCType.UNKNOWN
+        
+        classify_re = _FIRST_CHAR_DISPATCH.get(first)
+        if classify_re is None:
+            # Из остальных символов с \w (URL, домен) могут начинаться
+            # только не-ASCII буквы и цифры
+            if first.isascii() or not first.isalnum():
+                return IoCType.UNKNOWN
+            classify_re = _WORD_CLASSIFY_RE
+    
+    match = classify_re.match(value)
+    if match:
+        return _GROUP_TO_TYPE[match.lastgroup]
+    
+    return IoCType.UNKNOWN
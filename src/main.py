@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import argparse
-import re
 import sys
 
 from ioc.extractor import extract_iocs_from_files
@@ -10,6 +9,14 @@ from out.txt import export_to_text
 from out.xlsx import export_to_excel
 from out.csv import export_to_csv
 
+# Формат вывода -> (функция экспорта, имя файла по умолчанию)
+EXPORTERS = {
+    "json": (export_to_json, "ioc_results.json"),
+    "txt": (export_to_text, "ioc_results.txt"),
+    "xlsx": (export_to_excel, "ioc_results.xlsx"),
+    "csv": (export_to_csv, "ioc_results.csv"),
+}
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Извлечение индикаторов компрометации из DOCX-документов"
@@ -26,7 +33,7 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "-f", "--format",
-        choices=["json", "txt", "csv", "xlsx"],
+        choices=list(EXPORTERS),
         default="txt",
         help="Формат вывода (по умолчанию: txt)"
     )
@@ -45,26 +52,25 @@ if __name__ == "__main__":
         action="store_true",
         help="Выводить оригинальные URL (по умолчанию: извлечение доменов и IP-адресов)"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="Количество параллельных процессов (по умолчанию: число ядер, 1 - без параллелизма)"
+    )
     args = parser.parse_args()
 
+    results = extract_iocs_from_files(args.files,
+                                      pass_unknown=args.unknown,
                                       hash_original=args.hash_original,
-                                      url_original=args.url_original)
+                                      url_original=args.url_original,
+                                      max_workers=args.jobs)
 
-    if args.format:
-        if args.format == "json":
-            output_file = args.output or "ioc_results.json"
-            export_to_json(results, output_file)
-        elif args.format == "txt":
-            output_file = args.output or "ioc_results.txt"
-            export_to_text(results, output_file)
-        elif args.format == "xlsx":
-            output_file = args.output or "ioc_results.xlsx"
-            if not output_file.endswith('.xlsx'):
-                output_file += '.xlsx'
-            export_to_excel(results, output_file)
-        elif args.format == "csv":
-            output_file = args.output or "ioc_results.csv"
-            export_to_csv(results, output_file)
+    exporter, default_output = EXPORTERS[args.format]
+    output_file = args.output or default_output
+    if args.format == "xlsx" and not output_file.endswith('.xlsx'):
+        output_file += '.xlsx'
+    exporter(results, output_file)
 
     print(f"Результаты сохранены в {output_file}")
     
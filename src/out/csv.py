@@ -24,25 +24,27 @@ def export_to_csv(
     """
     output_path = Path(output_path)
     
-    # Преобразуем вложенную структуру в список словарей
-    # Каждый IoC становится отдельной строкой с информацией об источнике
+    # Каждый IoC становится отдельной строкой с информацией об источнике;
+    # строки пишутся сразу, без промежуточного списка словарей
     fieldnames = [
         'filepath', 'value', 'ioc_type', 'source_context', 
         'defanged', 'original_value']
-    ioc_records = []
     
-    for result in results.values():
-        for ioc in result.iocs:
-            ioc_records.append({
-                'filepath': result.filepath,
-                'value': ioc.value,
-                'ioc_type': ioc.ioc_type.name,  # Преобразуем Enum в строку
-                'source_context': ioc.source_context,
-                'defanged': ioc.defanged,
-                'original_value': ioc.original_value
-            })
-    
-    with open(output_path, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL, escapechar='\\')
-        writer.writeheader()
-        writer.writerows(ioc_records)
+    # Экранирование только удвоением кавычек (RFC 4180): escapechar удваивал бы
+    # обратные слэши, например, в Windows-путях колонки filepath
+    with open(output_path, 'w', newline='', buffering=1 << 20, encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile, quoting=csv.QUOTE_MINIMAL)
+        writerow = writer.writerow
+        writerow(fieldnames)
+        
+        for result in results.values():
+            filepath = result.filepath
+            for ioc in result.iocs:
+                writerow((
+                    filepath,
+                    ioc.value,
+                    ioc.ioc_type.name,  # Преобразуем Enum в строку
+                    ioc.source_context,
+                    ioc.defanged,
+                    ioc.original_value
+                ))
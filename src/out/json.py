@@ -2,6 +2,12 @@
 
 import json
 from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # orjson — необязательная зависимость
+    orjson = None
+
 from ioc.extractor import ExtractionResult
 
 
@@ -30,6 +36,12 @@ def export_to_json(
             "errors": result.errors
         }
 
-    json_output = json.dumps(output, indent=4)
-
-    Path(output_path).write_text(json_output, encoding="utf-8")
+    # orjson сериализует весь документ в C-коде заметно быстрее stdlib json;
+    # без него пишем в файл по частям, не собирая JSON в одну строку в памяти.
+    # Отступ в 2 пробела в обоих случаях: orjson другой не поддерживает
+    if orjson is not None:
+        with open(output_path, 'wb', buffering=1 << 20) as f:
+            f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
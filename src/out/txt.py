@@ -2,23 +2,28 @@ from pathlib import Path
 from ioc.extractor import ExtractionResult
 
 
+_SECTION_SEPARATOR = f"\n{'=' * 60}\n"
+_HEADER_SEPARATOR = f"{'-' * 60}\n"
+
+
 def export_to_text(
     results: dict[str, ExtractionResult],
     output_path: str | Path
 ):
     
-    lines = []
-    for filepath, result in results.items():
-        lines.append(f"\n{'='*60}")
-        lines.append(f"Файл: {filepath}")
-        lines.append(f"Найдено IoC: {len(result)}")
+    # Пишем построчно в буферизованный файл, не собирая весь текст в памяти
+    with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        write = f.write
+        for filepath, result in results.items():
+            write(_SECTION_SEPARATOR)
+            write(f"Файл: {filepath}\n")
+            write(f"Найдено IoC: {len(result)}\n")
+                
+            if result.errors:
+                write(f"Ошибки: {', '.join(result.errors)}\n")
             
-        if result.errors:
-            lines.append(f"Ошибки: {', '.join(result.errors)}")
-        
-        lines.append("-" * 60)
-
-        for ioc in result.iocs:
-            lines.append(ioc.value)
+            write(_HEADER_SEPARATOR)
 
-    Path(output_path).write_text('\n'.join(lines) + '\n', encoding="utf-8")
+            for ioc in result.iocs:
+                write(ioc.value)
+                write('\n')
@@ -1,9 +1,6 @@
 
 from pathlib import Path
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.worksheet import Worksheet
+import xlsxwriter
 
 from ioc.normalizer import IoCType
 from ioc.extractor import ExtractionResult
@@ -12,6 +9,26 @@ from ioc.extractor import ExtractionResult
 # Экспорт результатов в Excel
 # ============================================================================
 
+# Символы, запрещённые Excel в именах листов, заменяются на "_"
+_FORBIDDEN_SHEET_CHARS = str.maketrans({char: '_' for char in '\\/*?:[]'})
+
+# Имена, которые нельзя занять листом файла: "Summary" создаётся всегда,
+# "History" зарезервировано Excel
+_RESERVED_SHEET_NAMES = ('summary', 'history')
+
+# Типы, которые учитываются в колонке Hashes сводного листа
+_HASH_TYPES = (IoCType.HASH_MD5, IoCType.HASH_SHA1, IoCType.HASH_SHA256, IoCType.HASH_SHA512)
+
+# Общие свойства форматов
+_BORDER = {'border': 1, 'border_color': '#D9D9D9'}
+_DATA_FONT = {'font_name': 'Arial', 'font_size': 10}
+_BOLD_FONT = {'font_name': 'Arial', 'bold': True, 'font_size': 11}
+_HEADER = {
+    **_BOLD_FONT, 'font_color': '#FFFFFF',
+    'align': 'center', 'valign': 'vcenter', 'text_wrap': True, **_BORDER,
+}
+_DATA = {**_DATA_FONT, 'valign': 'top', **_BORDER}
+
 
 
 def export_to_excel(
@@ -22,65 +39,53 @@ def export_to_excel(
 ) -> Path:
     """
     Экспортирует результаты извлечения IoC в Excel-файл.
-    
+
     Каждый исходный файл сохраняется на отдельном листе с колонками:
     - value: нормализованное значение IoC
     - type: тип индикатора (HASH_SHA256, URL, IP_ADDRESS и т.д.)
     - original: исходное значение до нормализации
     - defanged: был ли индикатор "обезврежен" (True/False)
     - context: контекст, в котором найден индикатор
-    
+
     Args:
         results: Словарь {путь_к_файлу: ExtractionResult} из extract_from_files()
         output_path: Путь для сохранения Excel-файла
         include_context: Включать ли колонку context (может быть длинной)
         sheet_name_max_length: Максимальная длина имени листа (по умолчанию 31 — лимит Excel)
-        
+
     Returns:
         Path к созданному файлу
-        
+
     Raises:
-        ImportError: Если openpyxl не установлен
-        
+        ImportError: Если xlsxwriter не установлен
+
     Пример:
         results = extract_iocs_from_files(["report1.docx", "report2.docx"])
         export_to_excel(results, "iocs_export.xlsx")
     """
     output_path = Path(output_path)
-    
-    # Создаём новую книгу Excel
-    wb = Workbook()
-    
-    # Удаляем дефолтный лист, если будем создавать свои
-    if isinstance(wb.active, Worksheet):
-      default_sheet: Worksheet = wb.active
-      # Теперь можно безопасно работать с default_sheet
-      default_sheet['A1'] = 'Данные'
-    else:
-        # Обрабатываем неожиданную ситуацию
-        raise ValueError("Активный лист не является обычным рабочим листом")
-    
-    # Стили для заголовков
-    header_font = Font(name='Arial', bold=True, color='FFFFFF', size=11)
-    header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-    header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    # Стили для данных
-    data_font = Font(name='Arial', size=10)
-    data_alignment = Alignment(vertical='top', wrap_text=False)
-    data_alignment_wrap = Alignment(vertical='top', wrap_text=True)
-    
-    # Стиль для дефангированных значений (подсветка)
-    defanged_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
-    
-    # Границы
-    thin_border = Border(
-        left=Side(style='thin', color='D9D9D9'),
-        right=Side(style='thin', color='D9D9D9'),
-        top=Side(style='thin', color='D9D9D9'),
-        bottom=Side(style='thin', color='D9D9D9')
-    )
-    
+
+    # constant_memory: каждая строка сбрасывается на диск сразу после записи,
+    # в памяти держится только текущая строка листа.
+    # Значения IoC пишутся как есть - без превращения в ссылки и формулы
+    wb = xlsxwriter.Workbook(str(output_path), {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+    })
+
+    # Формат заголовков
+    header_format = wb.add_format({**_HEADER, 'bg_color': '#4472C4'})
+
+    # Форматы данных
+    data_format = wb.add_format(_DATA)
+    center_format = wb.add_format({**_DATA, 'align': 'center'})
+    context_format = wb.add_format({**_DATA, 'text_wrap': True})
+
+    # Подсветка дефангированных строк - условным форматом на весь диапазон,
+    # который Excel применяет при отображении
+    defanged_format = wb.add_format({'bg_color': '#FFF2CC'})
+
     # Определяем колонки
     if include_context:
         headers = ['value', 'type', 'original', 'defanged', 'rule_extracted', 'context']
@@ -89,104 +94,86 @@ def export_to_excel(
         headers = ['value', 'type', 'original', 'defanged', 'rule_extracted']
         column_widths = [60, 15, 60, 10, 20]
     # Отслеживаем использованные имена листов для уникальности
-    used_sheet_names: set[str] = set()
-    
+    used_sheet_names: set[str] = set(_RESERVED_SHEET_NAMES)
+
     def make_unique_sheet_name(filepath: str) -> str:
         """
         Создаёт уникальное и валидное имя листа из пути к файлу.
-        
+
         Excel имеет ограничения:
         - Максимум 31 символ
         - Запрещены символы: \\ / * ? : [ ]
+        - Имя не может начинаться или заканчиваться апострофом
         """
         # Извлекаем имя файла без расширения
         name = Path(filepath).stem
-        
-        # Удаляем запрещённые символы
-        forbidden_chars = ['\\', '/', '*', '?', ':', '[', ']']
-        for char in forbidden_chars:
-            name = name.replace(char, '_')
-        
+
+        # Заменяем запрещённые символы за один проход
+        name = name.translate(_FORBIDDEN_SHEET_CHARS)
+
         # Обрезаем до максимальной длины (оставляем место для суффикса)
         base_name = name[:sheet_name_max_length - 4]  # -4 для возможного суффикса "_99"
-        
-        # Делаем имя уникальным
+        if base_name.startswith("'"):
+            base_name = '_' + base_name[1:]
+        if base_name.endswith("'"):
+            base_name = base_name[:-1] + '_'
+
+        # Делаем имя уникальным (сравнение без учёта регистра, как в Excel)
         final_name = base_name
+        base_lower = final_lower = base_name.lower()
         counter = 1
-        while final_name.lower() in used_sheet_names:
+        while final_lower in used_sheet_names:
             final_name = f"{base_name}_{counter}"
+            final_lower = f"{base_lower}_{counter}"
             counter += 1
-        
-        used_sheet_names.add(final_name.lower())
+
+        used_sheet_names.add(final_lower)
         return final_name
-    
-    # Флаг: был ли использован дефолтный лист
-    first_sheet_used = False
-    
+
+    # Сводный лист идёт первым: xlsxwriter упорядочивает листы по созданию
+    _create_summary_sheet(wb, wb.add_worksheet("Summary"), results)
+
+    last_col = len(headers) - 1
+
     # Создаём лист для каждого файла
     for filepath, result in results.items():
-        sheet_name = make_unique_sheet_name(filepath)
-
-        
-        # Используем дефолтный лист для первого файла, потом создаём новые
-        if not first_sheet_used:
-            ws = default_sheet
-            ws.title = sheet_name
-            first_sheet_used = True
-        else:
-            ws = wb.create_sheet(title=sheet_name)
-        
-        # Записываем заголовки
-        for col_idx, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-        
+        ws = wb.add_worksheet(make_unique_sheet_name(filepath))
+
         # Устанавливаем ширину колонок
-        for col_idx, width in enumerate(column_widths, start=1):
-            col_letter = get_column_letter(col_idx)
-            ws.column_dimensions[col_letter].width = width
-        
-        # Записываем данные
-        for row_idx, ioc in enumerate(result.iocs, start=2):
-            # value
-            cell_value = ws.cell(row=row_idx, column=1, value=ioc.value)
-            cell_value.font = data_font
-            cell_value.alignment = data_alignment
-            cell_value.border = thin_border
-            
-            # type
-            cell_type = ws.cell(row=row_idx, column=2, value=ioc.ioc_type.name)
-            cell_type.font = data_font
-            cell_type.alignment = Alignment(horizontal='center', vertical='top')
-            cell_type.border = thin_border
-            
-            # original
-            cell_original = ws.cell(row=row_idx, column=3, value=ioc.original_value)
-            cell_original.font = data_font
-            cell_original.alignment = data_alignment
-            cell_original.border = thin_border
-            
-            # defanged
-            cell_defanged = ws.cell(row=row_idx, column=4, value=ioc.defanged)
-            cell_defanged.font = data_font
-            cell_defanged.alignment = Alignment(horizontal='center', vertical='top')
-            cell_defanged.border = thin_border
-            
-            # Подсвечиваем строку, если IoC был дефангирован
-            if ioc.defanged:
-                cell_value.fill = defanged_fill
-                cell_type.fill = defanged_fill
-                cell_original.fill = defanged_fill
-                cell_defanged.fill = defanged_fill
-             
-            # rule_extracted
-            cell_rule = ws.cell(row=row_idx, column=5, value=ioc.rule_extracted)
-            cell_rule.font = data_font
-            cell_rule.alignment = Alignment(horizontal='center', vertical='top')
-            cell_rule.border = thin_border
+        for col_idx, width in enumerate(column_widths):
+            ws.set_column(col_idx, col_idx, width)
+
+        # Закрепляем заголовок (freeze panes)
+        ws.freeze_panes(1, 0)
+
+        if result.iocs:
+            last_row = len(result.iocs) + 1
+
+            # Добавляем автофильтр
+            ws.autofilter(0, 0, last_row - 1, last_col)
+
+            # Подсвечиваем строку, если IoC был дефангирован (кроме rule_extracted)
+            highlight_range = f"A2:D{last_row}"
+            if include_context:
+                highlight_range += f" F2:F{last_row}"
+            ws.conditional_format(f"A2:D{last_row}", {
+                'type': 'formula',
+                'criteria': '=$D2=TRUE',
+                'format': defanged_format,
+                'multi_range': highlight_range,
+            })
+
+        # Записываем заголовки
+        ws.write_row(0, 0, headers, header_format)
+
+        # Записываем данные (в режиме constant_memory - строго по порядку строк)
+        write_string = ws.write_string
+        for row_idx, ioc in enumerate(result.iocs, start=1):
+            write_string(row_idx, 0, ioc.value, data_format)
+            write_string(row_idx, 1, ioc.ioc_type.name, center_format)
+            write_string(row_idx, 2, ioc.original_value, data_format)
+            ws.write_boolean(row_idx, 3, ioc.defanged, center_format)
+            write_string(row_idx, 4, ioc.rule_extracted, center_format)
 
             # context (опционально)
             if include_context:
@@ -194,96 +181,75 @@ def export_to_excel(
                 context_text = ioc.source_context
                 if len(context_text) > 500:
                     context_text = context_text[:497] + "..."
-                
-                cell_context = ws.cell(row=row_idx, column=6, value=context_text)
-                cell_context.font = data_font
-                cell_context.alignment = data_alignment_wrap
-                cell_context.border = thin_border
-                
-                if ioc.defanged:
-                    cell_context.fill = defanged_fill
-        
-        # Закрепляем заголовок (freeze panes)
-        ws.freeze_panes = 'A2'
-        
-        # Добавляем автофильтр
-        if result.iocs:
-            last_col = get_column_letter(len(headers))
-            last_row = len(result.iocs) + 1
-            ws.auto_filter.ref = f"A1:{last_col}{last_row}"
-    
+                write_string(row_idx, 5, context_text, context_format)
+
     # Если не было файлов с результатами, создаём пустой лист с информацией
-    if not first_sheet_used:
-        ws = default_sheet
-        ws.title = "No Results"
-        ws['A1'] = "Индикаторы компрометации не найдены"
-        ws['A1'].font = Font(name='Arial', size=12, italic=True)
-    
-    # Добавляем сводный лист в начало
-    summary_sheet = wb.create_sheet(title="Summary", index=0)
-    _create_summary_sheet(summary_sheet, results, headers, header_font, header_fill, 
-                          header_alignment, data_font, thin_border)
-    
+    if not results:
+        ws = wb.add_worksheet("No Results")
+        no_results_format = wb.add_format({'font_name': 'Arial', 'font_size': 12, 'italic': True})
+        ws.write_string(0, 0, "Индикаторы компрометации не найдены", no_results_format)
+
     # Сохраняем файл
-    wb.save(output_path)
-    
+    wb.close()
+
     return output_path
 
 
 
 def _create_summary_sheet(
+    wb: xlsxwriter.Workbook,
     ws,
     results: dict[str, ExtractionResult],
-    headers: list[str],
-    header_font,
-    header_fill,
-    header_alignment,
-    data_font,
-    thin_border
 ) -> None:
     """
     Создаёт сводный лист со статистикой по всем файлам.
-    
+
     Это вспомогательная функция для export_to_excel().
     """
-    
-    # Локальные стили для сводки
-    bold_font = Font(name='Arial', bold=True, size=11)
-    title_font = Font(name='Arial', bold=True, color='FFFFFF', size=12)
-    
+
+    # Локальные форматы для сводки
+    title_format = wb.add_format({
+        **_BOLD_FONT, 'font_color': '#FFFFFF', 'font_size': 12,
+        'bg_color': '#4472C4', 'align': 'center',
+    })
+    stat_header_format = wb.add_format({**_HEADER, 'bg_color': '#5B9BD5'})
+    file_format = wb.add_format({**_DATA_FONT, **_BORDER})
+    number_format = wb.add_format({**_DATA_FONT, 'align': 'center', **_BORDER})
+    total_label_format = wb.add_format({**_BOLD_FONT, 'bg_color': '#D9E2F3'})
+    total_format = wb.add_format({**_BOLD_FONT, 'bg_color': '#D9E2F3', 'align': 'center', **_BORDER})
+
+    # Ширина колонок
+    column_widths = [40, 12, 12, 12, 12, 12, 12]
+    for col_idx, width in enumerate(column_widths):
+        ws.set_column(col_idx, col_idx, width)
+
+    # Закрепляем заголовки
+    ws.freeze_panes(3, 0)
+
     # Заголовок сводки
-    ws['A1'] = "IoC Extraction Summary"
-    ws['A1'].font = title_font
-    ws.merge_cells('A1:G1')
-    ws['A1'].fill = header_fill
-    ws['A1'].alignment = Alignment(horizontal='center')
-    
+    ws.merge_range(0, 0, 0, 6, "IoC Extraction Summary", title_format)
+
     # Заголовки таблицы статистики
     stat_headers = ['File', 'Total IoCs', 'Hashes', 'URLs', 'IPs', 'Other', 'Errors']
-    for col_idx, header in enumerate(stat_headers, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = PatternFill(start_color='5B9BD5', end_color='5B9BD5', fill_type='solid')
-        cell.alignment = header_alignment
-        cell.border = thin_border
-    
+    ws.write_row(2, 0, stat_headers, stat_header_format)
+
     # Данные по каждому файлу
-    row_idx = 4
+    row_idx = 3
     total_iocs = 0
     total_hashes = 0
     total_urls = 0
     total_ips = 0
     total_other = 0
     total_errors = 0
-    
+
     for filepath, result in results.items():
-        # Подсчитываем статистику
-        hashes = len([i for i in result.iocs if i.ioc_type.name.startswith('HASH_')])
-        urls = len(result.by_type(IoCType.URL))
-        ips = len(result.by_type(IoCType.IP_ADDRESS))
+        # Счётчики берутся из индекса по типам, без проходов по result.iocs
+        hashes = sum(result.count_by_type(t) for t in _HASH_TYPES)
+        urls = result.count_by_type(IoCType.URL)
+        ips = result.count_by_type(IoCType.IP_ADDRESS)
         other = len(result) - hashes - urls - ips
         errors = len(result.errors)
-        
+
         # Накапливаем итоги
         total_iocs += len(result)
         total_hashes += hashes
@@ -291,37 +257,15 @@ def _create_summary_sheet(
         total_ips += ips
         total_other += other
         total_errors += errors
-        
+
         # Записываем строку
         filename = Path(filepath).name
-        row_data = [filename, len(result), hashes, urls, ips, other, errors]
-        
-        for col_idx, value in enumerate(row_data, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.font = data_font
-            cell.border = thin_border
-            if col_idx > 1:
-                cell.alignment = Alignment(horizontal='center')
-        
+        ws.write_string(row_idx, 0, filename, file_format)
+        ws.write_row(row_idx, 1, [len(result), hashes, urls, ips, other, errors], number_format)
+
         row_idx += 1
-    
+
     # Итоговая строка
-    total_cell = ws.cell(row=row_idx, column=1, value="TOTAL")
-    total_cell.font = bold_font
-    total_cell.fill = PatternFill(start_color='D9E2F3', end_color='D9E2F3', fill_type='solid')
-    
+    ws.write_string(row_idx, 0, "TOTAL", total_label_format)
     totals = [total_iocs, total_hashes, total_urls, total_ips, total_other, total_errors]
-    for col_idx, value in enumerate(totals, start=2):
-        cell = ws.cell(row=row_idx, column=col_idx, value=value)
-        cell.font = bold_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.fill = PatternFill(start_color='D9E2F3', end_color='D9E2F3', fill_type='solid')
-        cell.border = thin_border
-    
-    # Ширина колонок
-    column_widths = [40, 12, 12, 12, 12, 12, 12]
-    for col_idx, width in enumerate(column_widths, start=1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = width
-    
-    # Закрепляем заголовки
-    ws.freeze_panes = 'A4'
+    ws.write_row(row_idx, 1, totals, total_format)
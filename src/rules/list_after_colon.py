@@ -1,5 +1,6 @@
 import re
 from docx.document import Document
+from docx.oxml.document import CT_Body
 from typing import Iterator
 from ioc.normalizer import IoC, IoCNormalizer
 from rules.rule import IoCExtractionRule
@@ -20,6 +21,11 @@ class ListAfterColonRule(IoCExtractionRule):
     - Списки из одного элемента
     """
     
+    # Шаблоны для _looks_like_ioc (компилируем заранее)
+    _HEX_DIGITS = '0123456789abcdefABCDEF'
+    _URL_RE = re.compile(r'(?:hxxps?|https?|ftp)', re.IGNORECASE)
+    _IP_RE = re.compile(r'\d{1,3}(?:\[?\.\]?\d{1,3}){3}')
+    
     def __init__(self, normalizer: IoCNormalizer) -> None:
         self._normalizer = normalizer
 
@@ -28,64 +34,77 @@ class ListAfterColonRule(IoCExtractionRule):
         return "list_after_colon"
     
     def extract(self, document: Document) -> Iterator[IoC]:
-        paragraphs = list(document.paragraphs)
+        return self.extract_from_tree(document.element.body)
+    
+    def extract_from_tree(self, body: CT_Body) -> Iterator[IoC]:
+        # Элементы <w:p> верхнего уровня - те же, что и document.paragraphs, но без обёрток.
+        # Текст каждого параграфа собирается один раз: при смене контекста
+        # внутренний цикл возвращает параграф внешнему, и он читается повторно
+        texts = [text.strip() for text in self._all_paragraph_texts(body)]
+        # Последний символ каждого параграфа ('' для пустого) - по нему
+        # выбираются переходы, без повторных вызовов endswith
+        ends = [text[-1:] for text in texts]
+        n = len(texts)
         i = 0
         
-        while i < len(paragraphs):
-            text = self._get_paragraph_text(paragraphs[i]).strip()
+        while i < n:
+            # Ищем параграф, заканчивающийся двоеточием (поиск в C, без цикла по параграфам)
+            try:
+                i = ends.index(':', i)
+            except ValueError:
+                break
             
-            # Ищем параграф, заканчивающийся двоеточием
-            if text.endswith(':'):
-                context = text
-                i += 1
+            context = texts[i]
+            i += 1
+            
+            # Собираем элементы списка
+            while i < n:
+                end = ends[i]
+                
+                if not end:
+                    i += 1
+                    continue
                 
-                # Собираем элементы списка
-                while i < len(paragraphs):
-                    item_text = self._get_paragraph_text(paragraphs[i]).strip()
-                    
-                    if not item_text:
-                        i += 1
-                        continue
-                    
-                    # Элемент с точкой с запятой - продолжаем собирать
-                    if item_text.endswith(';'):
-                        value = item_text[:-1].strip()
-                        if value:
-                            yield self._normalizer.normalize_and_classify(value, context)
-                        i += 1
-                        continue
-                    
-                    # Элемент с точкой - последний в списке
-                    if item_text.endswith('.'):
-                        value = item_text[:-1].strip()
-                        if value:
-                            yield self._normalizer.normalize_and_classify(value, context)
-                        i += 1
-                        break
-                    
-                    # Элемент без разделителя - возможно, часть того же списка
-                    # или уже начался новый контекст
-                    # Проверяем, похоже ли это на IoC
-                    if self._looks_like_ioc(item_text):
-                        yield self._normalizer.normalize_and_classify(item_text, context)
-                        i += 1
-                        continue
-                    
-                    # Это уже другой контекст
+                # Элемент с точкой с запятой - продолжаем собирать
+                if end == ';':
+                    # Текст уже без пробелов в начале - достаточно убрать их перед разделителем
+                    value = texts[i][:-1].rstrip()
+                    if value:
+                        yield self._normalizer.normalize_and_classify(value, context)
+                    i += 1
+                    continue
+                
+                # Элемент с точкой - последний в списке
+                if end == '.':
+                    # Текст уже без пробелов в начале - достаточно убрать их перед разделителем
+                    value = texts[i][:-1].rstrip()
+                    if value:
+                        yield self._normalizer.normalize_and_classify(value, context)
+                    i += 1
                     break
-            else:
-                i += 1
+                
+                # Элемент без разделителя - возможно, часть того же списка
+                # или уже начался новый контекст
+                # Проверяем, похоже ли это на IoC (только здесь, а не для каждого параграфа)
+                item_text = texts[i]
+                if self._looks_like_ioc(item_text):
+                    yield self._normalizer.normalize_and_classify(item_text, context)
+                    i += 1
+                    continue
+                
+                # Это уже другой контекст
+                break
     
     def _looks_like_ioc(self, text: str) -> bool:
         """Проверяет, похоже ли значение на IoC."""
-        # Хэши (32, 40, 64, 128 символов hex)
-        if re.match(r'^[a-fA-F0-9]{32,128}$', text):
+        # Хэши (от 32 до 128 символов hex): strip по набору hex-символов
+        # оставляет пустую строку, только если других символов нет
+        if 32 <= len(text) <= 128 and not text.strip(self._HEX_DIGITS):
             return True
         # URL-подобные строки
-        if re.match(r'^(?:hxxps?|https?|ftp)', text, re.IGNORECASE):
+        if self._URL_RE.match(text):
             return True
         # IP-адреса
-        if re.match(r'^\d{1,3}(?:\[?\.\]?\d{1,3}){3}', text):
+        if self._IP_RE.match(text):
             return True
         return False
-
@@ -1,11 +1,16 @@
 import re
+from bisect import bisect_right
 from typing import Iterator
 from docx.document import Document
+from docx.oxml.document import CT_Body
 from ioc.normalizer import IoC, IoCNormalizer
 from rules.rule import IoCExtractionRule
 from typing import Iterator, Optional
 
 
+_NEWLINE_RE = re.compile(r'\n')
+
+
 class RegexPatternRule(IoCExtractionRule):
     """
     Правило для извлечения IoC с помощью регулярных выражений.
@@ -43,6 +48,28 @@ class RegexPatternRule(IoCExtractionRule):
         'email': re.compile(r'\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b'),
     }
     
+    # Хэши всех длин ищутся одним проходом. Каждое совпадение — целое
+    # hex-слово фиксированной длины, поэтому совпадения разных веток не
+    # пересекаются и результат равен объединению четырёх отдельных поисков.
+    # Остальные паттерны не объединяются: их совпадения вкладываются друг
+    # в друга (IP внутри URL, домен внутри дефангированного URL)
+    HASH_PATTERN = re.compile(
+        r'\b(?:(?P<hash_sha512>[a-fA-F0-9]{128})|(?P<hash_sha256>[a-fA-F0-9]{64})'
+        r'|(?P<hash_sha1>[a-fA-F0-9]{40})|(?P<hash_md5>[a-fA-F0-9]{32}))\b'
+    )
+    
+    # Литерал, без которого встроенный паттерн не может совпасть (ищется
+    # в тексте в нижнем регистре). Если его нет, полный проход regex по
+    # документу пропускается
+    PATTERN_LITERALS = {
+        'url_defanged': 'hxxp',
+        'url_normal': 'http',
+        'ip_defanged': '[.]',
+        'domain_defanged': '[.]',
+        'cve': 'cve-',
+        'email': '@',
+    }
+    
     def __init__(self, normalizer: IoCNormalizer, patterns: Optional[dict] = None):
         """
         Args:
@@ -57,13 +84,11 @@ class RegexPatternRule(IoCExtractionRule):
         return "regex_pattern"
     
     def extract(self, document: Document) -> Iterator[IoC]:
-        # Собираем весь текст из параграфов
-        all_text_parts = []
-        
-        for paragraph in document.paragraphs:
-            text = self._get_paragraph_text(paragraph)
-            if text:
-                all_text_parts.append(text)
+        return self.extract_from_tree(document.element.body)
+    
+    def extract_from_tree(self, body: CT_Body) -> Iterator[IoC]:
+        # Собираем весь текст из непустых параграфов
+        all_text_parts = [text for text in self._all_paragraph_texts(body) if text]
         
         full_text = self.normalize_text_for_url_extraction('\n'.join(all_text_parts))
         
@@ -72,8 +97,31 @@ class RegexPatternRule(IoCExtractionRule):
         
         all_patterns = {**self.SEARCH_PATTERNS, **self._custom_patterns}
         
+        # Раскладываем совпадения хэшей по типам, чтобы выдавать их
+        # в прежнем порядке паттернов
+        hash_matches = {name: [] for name in self.HASH_PATTERN.groupindex}
+        for match in self.HASH_PATTERN.finditer(full_text):
+            hash_matches[match.lastgroup].append(match)
+        
+        lowered_text = full_text.lower()
+        text_length = len(full_text)
+        
+        # Начала строк (параграфов) текста - для поиска границ контекста
+        line_starts = [0]
+        line_starts.extend(m.end() for m in _NEWLINE_RE.finditer(full_text))
+        
         for pattern_name, pattern in all_patterns.items():
-            for match in pattern.finditer(full_text):
+            builtin = pattern is self.SEARCH_PATTERNS.get(pattern_name)
+            if builtin and pattern_name in hash_matches:
+                matches = hash_matches[pattern_name]
+            elif builtin and self.PATTERN_LITERALS.get(pattern_name, '') not in lowered_text:
+                # В документе нет обязательного литерала - совпадений быть не может
+                continue
+            else:
+                # Пользовательский паттерн или паттерн, не входящий в HASH_PATTERN
+                matches = pattern.finditer(full_text)
+            
+            for match in matches:
                 value = match.group()
                 
                 # Дедупликация по значению
@@ -82,9 +130,15 @@ class RegexPatternRule(IoCExtractionRule):
                 seen.add(value)
                 
                 # Определяем контекст (несколько слов вокруг найденного значения)
-                start = max(0, match.start() - 50)
-                end = min(len(full_text), match.end() + 50)
-                context = full_text[start:end].replace('\n', ' ').strip()
+                # в пределах строк, на которых находится совпадение
+                match_start = match.start()
+                match_end = match.end()
+                line_start = line_starts[bisect_right(line_starts, match_start) - 1]
+                next_line = bisect_right(line_starts, match_end)
+                line_end = line_starts[next_line] - 1 if next_line < len(line_starts) else text_length
+                start = max(line_start, match_start - 50)
+                end = min(line_end, match_end + 50)
+                context = full_text[start:end].strip()
                 
                 yield self._normalizer.normalize_and_classify(value, f"[{pattern_name}] ...{context}...")
 
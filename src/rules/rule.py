@@ -3,8 +3,25 @@ from abc import ABC, abstractmethod
 from docx.document import Document
 from typing import Iterator, Optional
 from docx.text.paragraph import Paragraph
+from docx.oxml.document import CT_Body
+from docx.oxml.ns import qn
+from docx.oxml.table import CT_Tc
+from docx.oxml.text.paragraph import CT_P
 from ioc.normalizer import IoC
 
+
+_W_P = qn('w:p')
+_W_R = qn('w:r')
+_W_T = qn('w:t')
+
+# Текстовые эквиваленты остальных дочерних элементов <w:r> (как в CT_R.text).
+# w:br и w:cr дают перевод строки, который всё равно удаляется из текста параграфа
+_RUN_CHILD_TEXT = {
+    qn('w:tab'): '\t',
+    qn('w:ptab'): '\t',
+    qn('w:noBreakHyphen'): '-',
+}
+
 class IoCExtractionRule(ABC):
     """
     Абстрактный базовый класс для правил извлечения IoC.
@@ -20,6 +37,10 @@ class IoCExtractionRule(ABC):
             def extract(self, document: Document) -> Iterator[IoC]:
                 # Ваша логика извлечения
                 yield IoC(value="...")
+    
+    Правило, которому достаточно XML основного документа, может дополнительно
+    реализовать extract_from_tree() - тогда экстрактор сможет не загружать
+    DOCX-пакет целиком (см. supports_tree).
     """
     
     @property
@@ -41,6 +62,27 @@ class IoCExtractionRule(ABC):
         """
         pass
     
+    def extract_from_tree(self, body: CT_Body) -> Iterator[IoC]:
+        """
+        Извлекает IoC из элемента <w:body> основного документа (word/document.xml).
+        
+        Необязательный быстрый путь: если его реализуют все правила, экстрактор
+        читает из архива только word/document.xml, не открывая через python-docx
+        весь пакет (стили, нумерацию, колонтитулы, медиа).
+        
+        Args:
+            body: Элемент <w:body> (то же, что document.element.body)
+            
+        Yields:
+            Объекты IoC
+        """
+        raise NotImplementedError
+    
+    @property
+    def supports_tree(self) -> bool:
+        """Реализует ли правило extract_from_tree()."""
+        return type(self).extract_from_tree is not IoCExtractionRule.extract_from_tree
+    
     def _get_paragraph_text(self, paragraph: Paragraph) -> str:
         """
         Извлекает текст из параграфа, игнорируя форматирование.
@@ -49,11 +91,49 @@ class IoCExtractionRule(ABC):
         что позволяет игнорировать стилизацию.
         Убирает символы перевода строки внутри runs игнорируя мягкие разрывы строк Shift + Enter.
         """
-        return "".join(run.text.replace('\n', '') for run in paragraph.runs)
+        return self._get_paragraph_element_text(paragraph._p)
+    
+    def _get_paragraph_element_text(self, p: CT_P) -> str:
+        """
+        Извлекает текст из XML-элемента параграфа <w:p>.
+        
+        Результат совпадает с _get_paragraph_text, но без создания обёрток
+        Paragraph/Run на каждый параграф и run - для обхода больших документов
+        через document.element.body.
+        """
+        # Обход дочерних элементов средствами lxml вместо XPath-запросов
+        # CT_P.r_lst и CT_R.text на каждый параграф и run
+        parts = []
+        for r in p.iterchildren(_W_R):
+            for child in r.iterchildren():
+                tag = child.tag
+                if tag == _W_T:
+                    parts.append(child.text or '')
+                else:
+                    text = _RUN_CHILD_TEXT.get(tag)
+                    if text:
+                        parts.append(text)
+        return "".join(parts).replace('\n', '')
+    
+    def _all_paragraph_texts(self, body: CT_Body) -> list[str]:
+        """
+        Возвращает тексты всех параграфов верхнего уровня <w:body>
+        (то же, что document.paragraphs) за один проход по дереву.
+        """
+        get_text = self._get_paragraph_element_text
+        return [get_text(p) for p in body.iterchildren(_W_P)]
     
     def _get_cell_text(self, cell) -> str:
         """Извлекает текст из ячейки таблицы."""
-        return "\n".join(
-            self._get_paragraph_text(p) for p in cell.paragraphs
-        ).strip()
+        return self._get_cell_element_text(cell._tc)
+    
+    def _get_cell_element_text(self, tc: CT_Tc) -> str:
+        """
+        Извлекает текст из XML-элемента ячейки <w:tc>.
+        
+        Результат совпадает с _get_cell_text (параграфы ячейки через перевод
+        строки), но без создания обёрток _Cell/Paragraph.
+        """
+        get_text = self._get_paragraph_element_text
+        return "\n".join([get_text(p) for p in tc.iterchildren(_W_P)]).strip()
 
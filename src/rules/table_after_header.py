@@ -1,12 +1,69 @@
-import re
-from docx.table import Table
+import sys
 from docx.document import Document
+from docx.oxml.document import CT_Body
+from docx.oxml.ns import nsmap, qn
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from lxml import etree
 from typing import Iterator
 from ioc.normalizer import IoC, IoCNormalizer
 
 from rules.rule import IoCExtractionRule
 
 
+# Типичные слова в заголовках таблиц, которые нужно пропустить
+_HEADER_WORDS = frozenset({
+    'тип', 'type', 'значение', 'value', 'описание', 'description',
+    'индикатор', 'indicator', 'hash', 'хэш', 'ip', 'domain', 'домен',
+    'url', 'email', 'comment', 'комментарий', 'название', 'name',
+    'sha256', 'sha1', 'md5', 'sha512'
+})
+
+_W_P = qn('w:p')
+_W_TBL = qn('w:tbl')
+
+# Есть ли у параграфа run с run.bold is True: первый <w:b> в свойствах run
+# без атрибута val или со значением "включено". Проверка выполняется в libxml2
+# без создания объектов Paragraph/Run. Выражение компилируется один раз -
+# element.xpath() разбирает строку выражения заново при каждом вызове
+_HAS_BOLD_RUN = etree.XPath(
+    'boolean(./w:r/w:rPr[1]/w:b[1]'
+    '[not(@w:val) or @w:val="1" or @w:val="true" or @w:val="on"])',
+    namespaces={'w': nsmap['w']},
+)
+
+
+# Текст всех <w:t> в run'ах параграфа одним вызовом libxml2
+_RUN_TEXTS = etree.XPath(
+    'w:r/w:t/text()',
+    namespaces={'w': nsmap['w']},
+    smart_strings=False,
+)
+
+
+def _without_redundant_keywords(keywords: tuple[str, ...]) -> tuple[str, ...]:
+    """Оставляет ключевые слова, не содержащие других, от коротких к длинным."""
+    needles = [
+        keyword for keyword in keywords
+        if not any(other != keyword and other in keyword for other in keywords)
+    ]
+    return tuple(sorted(needles, key=len))
+
+
+# Ключевые слова для поиска заголовка (без учёта регистра)
+_HEADER_KEYWORDS: tuple[str, ...] = (
+    "индикаторы компрометации",
+    "indicators of compromise",
+    "ioc",
+    "iocs",
+)
+
+# Ключевые слова, которые проверяются на самом деле: слово, содержащее
+# другое ключевое слово ("iocs" содержит "ioc"), ничего не добавляет.
+# Короткие идут первыми - ими чаще всего и обозначают заголовок
+_HEADER_NEEDLES = _without_redundant_keywords(_HEADER_KEYWORDS)
+
+
 class TableAfterHeaderRule(IoCExtractionRule):
     """
     Правило для извлечения IoC из таблиц после заголовка "индикаторы компрометации".
@@ -14,14 +71,6 @@ class TableAfterHeaderRule(IoCExtractionRule):
     Ищет заголовки (выровненные по центру или содержащие ключевые слова),
     за которыми следует таблица с IoC в ячейках.
     """
-    
-    # Ключевые слова для поиска заголовка (без учёта регистра)
-    HEADER_KEYWORDS = [
-        "индикаторы компрометации",
-        "indicators of compromise",
-        "ioc",
-        "iocs",
-    ]
 
     def __init__(self, normlizer: IoCNormalizer) -> None:
         self._normlizer = normlizer
@@ -31,72 +80,148 @@ class TableAfterHeaderRule(IoCExtractionRule):
         return "table_after_header"
     
     def extract(self, document: Document) -> Iterator[IoC]:
-        # Собираем все элементы документа в порядке появления
-        # (параграфы и таблицы могут чередоваться)
-        elements = []
+        return self.extract_from_tree(document.element.body)
+    
+    def extract_from_tree(self, body: CT_Body) -> Iterator[IoC]:
+        # Один проход по элементам документа в порядке появления
+        # (параграфы и таблицы могут чередоваться) без обёрток python-docx
         
-        for element in document.element.body:
-            if element.tag.endswith('p'):
-                # Это параграф - ищем соответствующий объект Paragraph
-                for p in document.paragraphs:
-                    if p._element is element:
-                        elements.append(('paragraph', p))
-                        break
-            elif element.tag.endswith('tbl'):
-                # Это таблица
-                for t in document.tables:
-                    if t._tbl is element:
-                        elements.append(('table', t))
-                        break
+        # Заголовки, для которых ещё ищется следующая таблица. Их может быть
+        # несколько: жирный параграф после заголовка сам может быть заголовком
+        pending_contexts: list[str] = []
+        header_needles = _HEADER_NEEDLES
         
-        # Ищем паттерн: заголовок -> таблица
-        for i, (elem_type, elem) in enumerate(elements):
-            if elem_type == 'paragraph':
-                text = self._get_paragraph_text(elem).strip().lower()
+        for element in body:
+            # Точное сравнение тегов: endswith('p') совпал бы с любым тегом на "p",
+            # а у комментариев XML tag - не строка
+            tag = element.tag
+            if tag == _W_P:
+                # Пока таблица не ищется, параграф важен, только если он
+                # заголовок - остальные отсекаются без сборки полного текста
+                if not pending_contexts and not self._may_be_header(element):
+                    continue
                 
-                # Проверяем, содержит ли параграф ключевые слова
-                if any(kw in text for kw in self.HEADER_KEYWORDS):
-                    context = self._get_paragraph_text(elem).strip()
-                    has_bold = any(run.bold is True for run in elem.runs)
-                    
-                    # Ищем следующую таблицу
-                    for j in range(i + 1, len(elements)):
-                        next_type, next_elem = elements[j]
-                        
-                        if next_type == 'table':
-                            yield from self._extract_from_table(next_elem, context)
-                            break
-                        elif next_type == 'paragraph':
-                            # Продолжаем, если параграф выделен жирным шрифтом
-                            if any(run.bold is True for run in next_elem.runs) or self._get_paragraph_text(next_elem).strip() == "":
-                                continue
-
-                            # Если следующий параграф не выделен жирным и пустой, прерываем поиск
-                            break
+                # Текст параграфа собирается один раз: он же проверяется
+                # на ключевые слова и он же становится контекстом
+                text = self._get_paragraph_element_text(element).strip()
+                
+                # Пустой параграф не прерывает поиск таблицы
+                # и не может быть заголовком
+                if not text:
+                    continue
+                
+                if pending_contexts and not self._should_continue(element):
+                    pending_contexts.clear()
+                
+                # Проверяем, содержит ли параграф ключевые слова: несколько
+                # проверок "in" по тексту в нижнем регистре быстрее и regex, и any()
+                lowered = text.lower()
+                for keyword in header_needles:
+                    if keyword in lowered:
+                        # Контекст попадает в каждый IoC таблицы. Одинаковые
+                        # заголовки (в этом и других документах) делят одну строку
+                        pending_contexts.append(sys.intern(text))
+                        break
+            
+            elif tag == _W_TBL:
+                # Таблица после заголовка
+                if pending_contexts:
+                    for context in pending_contexts:
+                        yield from self._extract_from_table(element, context)
+                    pending_contexts.clear()
+    
+    def _may_be_header(self, p: CT_P) -> bool:
+        """
+        Быстрая проверка, может ли параграф <w:p> содержать ключевое слово.
+        
+        Проверяется склейка одних <w:t> без табуляций и неразрывных дефисов.
+        Ключевые слова этих символов не содержат, поэтому слово, найденное
+        в полном тексте параграфа, найдётся и здесь: ложных отказов нет.
+        """
+        lowered = ''.join(_RUN_TEXTS(p)).replace('\n', '').lower()
+        for keyword in _HEADER_NEEDLES:
+            if keyword in lowered:
+                return True
+        return False
     
-    def _extract_from_table(self, table: Table, context: str) -> Iterator[IoC]:
+    def _should_continue(self, p: CT_P) -> bool:
+        """
+        Продолжается ли поиск таблицы после непустого параграфа <w:p>.
+        
+        Поиск продолжается, если в параграфе есть run, выделенный жирным
+        шрифтом (пустые параграфы пропускаются до этой проверки).
+        """
+        return _HAS_BOLD_RUN(p)
+    
+    def _extract_from_table(self, tbl: CT_Tbl, context: str) -> Iterator[IoC]:
         """Извлекает IoC из всех ячеек таблицы, пропуская заголовки."""
-        # Типичные слова в заголовках таблиц, которые нужно пропустить
-        HEADER_WORDS = {
-            'тип', 'type', 'значение', 'value', 'описание', 'description',
-            'индикатор', 'indicator', 'hash', 'хэш', 'ip', 'domain', 'домен',
-            'url', 'email', 'comment', 'комментарий', 'название', 'name',
-            'sha256', 'sha1', 'md5', 'sha512'
-        }
+        # Локальные ссылки вместо поиска атрибутов на каждой строке ячейки
+        normalize = self._normlizer.normalize_and_classify
+        header_words = _HEADER_WORDS
+        
+        # Строки, уже переданные в нормализатор: одинаковые значения в таблице
+        # (в том числе из объединённых ячеек) дали бы тот же IoC,
+        # который экстрактор всё равно отбросит как дубликат
+        seen: set[str] = set()
         
-        for row_idx, row in enumerate(table.rows):
-            for cell in row.cells:
-                cell_text = self._get_cell_text(cell)
+        for row_texts in self._iter_row_texts(tbl):
+            for cell_text in row_texts:
                 
                 if not cell_text:
                     continue
                 
-                # Пропускаем типичные заголовки
-                if cell_text.lower().strip() in HEADER_WORDS:
+                # Пропускаем типичные заголовки. Нижний регистр считается
+                # один раз на ячейку и переиспользуется для её строк
+                cell_lower = cell_text.lower()
+                if cell_lower.strip() in header_words:
                     continue 
                 
                 # Ячейка может содержать несколько IoC, разделённых переносами
-                for line in cell_text.split('\n'):
+                # (в том числе \r\n и символами-разделителями строк Unicode)
+                for line, line_lower in zip(cell_text.splitlines(), cell_lower.splitlines()):
                     line = line.strip()
-                    if line and line.lower() not in HEADER_WORDS:
-                        yield self._normlizer.normalize_and_classify(line, context)
+                    if not line or line in seen:
+                        continue
+                    seen.add(line)
+                    
+                    if line_lower.strip() not in header_words:
+                        yield normalize(line, context)
+    
+    def _iter_row_texts(self, tbl: CT_Tbl) -> Iterator[list[str]]:
+        """
+        Возвращает тексты ячеек каждой строки таблицы - то же, что
+        _get_cell_text для каждой ячейки row.cells из table.rows.
+        
+        Обход идёт напрямую по <w:tr>/<w:tc>: row.cells для каждой
+        ячейки-продолжения вертикального объединения ищет ячейку сверху
+        XPath-запросами, что даёт квадратичное время на больших таблицах.
+        Здесь ячейки предыдущей строки запоминаются по смещению в сетке.
+        """
+        get_cell_text = self._get_cell_element_text
+        
+        # Смещение в сетке -> (текст, ширина) ячейки предыдущей строки
+        above: dict[int, tuple[str, int]] = {}
+        
+        for tr in tbl.tr_lst:
+            # Строка собирается целиком до выдачи - как кортеж row.cells
+            row_texts: list[str] = []
+            current: dict[int, tuple[str, int]] = {}
+            offset = tr.grid_before
+            
+            for tc in tr.tc_lst:
+                span = tc.grid_span
+                if tc.vMerge == "continue":
+                    # Продолжение объединения повторяет ячейку сверху
+                    cell = above.get(offset)
+                    if cell is None:
+                        raise ValueError(f"no `tc` element at grid_offset={offset}")
+                else:
+                    cell = (get_cell_text(tc), span)
+                
+                current[offset] = cell
+                # Объединённая по горизонтали ячейка повторяется по числу колонок
+                row_texts.extend([cell[0]] * cell[1])
+                offset += span
+            
+            above = current
+            yield row_texts